@@ -6,8 +6,28 @@ from typing import Optional
 from core.error import AkiTypeErr, AkiSyntaxErr
 
 
+_i32 = ir.IntType(32)
+_small_ints = tuple(ir.Constant(_i32, _) for _ in range(8))
+
+
 def _int(value: int):
-    return ir.Constant(ir.IntType(32), value)
+    if 0 <= value < 8:
+        return _small_ints[value]
+    return ir.Constant(_i32, value)
+
+
+_gep_indices: dict = {}
+
+
+def _gep_index(*positions: int):
+    """
+    Return a cached tuple of i32 constants for a GEP index path.
+    """
+    indices = _gep_indices.get(positions)
+    if indices is None:
+        indices = tuple(_int(_) for _ in positions)
+        _gep_indices[positions] = indices
+    return indices
 
 
 class AkiType:
@@ -72,7 +92,7 @@ class AkiType:
         return node
 
     def c_size(self, codegen, node, llvm_obj):
-        size = llvm_obj.type.get_abi_size(codegen.typemgr.target_data())
+        size = codegen.typemgr.abi_size(llvm_obj.type)
         return codegen._codegen(Constant(node, size, codegen.types["u_size"]))
 
 
@@ -347,7 +367,7 @@ class AkiBool(AkiType, AkiIntBoolMathOps):
         return False
 
     def unop_neg(self, codegen, node, operand):
-        lhs = codegen._codegen(Constant(node, 1, operand.akitype))
+        lhs = codegen._typed_const(operand.akitype, 1)
         return codegen.builder.xor(lhs, operand, "bnegop")
 
     def format_result(self, result):
@@ -365,7 +385,7 @@ class AkiInt(AkiBaseInt):
         super().__init__(bits, True)
 
     def unop_neg(self, codegen, node, operand):
-        lhs = codegen._codegen(Constant(node, 0, operand.akitype))
+        lhs = codegen._typed_const(operand.akitype, 0)
         return codegen.builder.sub(lhs, operand, "negop")
 
 
@@ -400,9 +420,7 @@ class AkiBaseFloat(AkiType):
         return codegen.builder.fdiv(lhs, rhs, f".f{op_name}")
 
     def unop_neg(self, codegen, node, operand):
-        lhs = codegen._codegen(
-            Constant(node, 0.0, VarTypeName(node, operand.akitype.type_id))
-        )
+        lhs = codegen._typed_const(operand.akitype, 0.0)
         return codegen.builder.fsub(lhs, operand, "fnegop")
 
     signed = True
@@ -449,21 +467,18 @@ class AkiArray(AkiObject, AkiType):
 
     signed = None
     name = None
+    rank = 0
 
     def __init__(self, module):
         self.module = module
 
-    def new(self, codegen, node, base_type: AkiType, accessors: list):
-        new = AkiArray(codegen.module)
-
-        array_type = base_type.llvm_type
-        array_type.akitype = base_type
-        array_type.akinode = node
-
-        array_aki_type = base_type
-        subaccessors = []
+    def _resolve_array_dims(self, codegen, node, accessors: list):
+        """
+        Return the constant dimensions for an array declaration.
+        """
+        dims = []
 
-        for _ in reversed(accessors):
+        for _ in accessors:
             accessor_dimension = None
             if isinstance(_, Constant):
                 accessor_dimension = _.val
@@ -474,11 +489,13 @@ class AkiArray(AkiObject, AkiType):
                 # except Exception as e:
                 #     print("err", e)
 
+                # Only module-level names with a constant initializer
+                # can be used as a dimension.
+
                 name_val = codegen._name(node, _.name)
-                try:
-                    accessor_dimension = name_val.initializer.constant
-                except Exception:
-                    pass
+                initializer = getattr(name_val, "initializer", None)
+                if isinstance(initializer, ir.Constant):
+                    accessor_dimension = initializer.constant
 
             if not accessor_dimension:
                 raise AkiSyntaxErr(
@@ -487,11 +504,35 @@ class AkiArray(AkiObject, AkiType):
                     f"Only constants (not computed values) allowed for array dimensions",
                 )
 
+            dims.append(accessor_dimension)
+
+        return dims
+
+    def new(self, codegen, node, base_type: AkiType, accessors: list):
+        dims = self._resolve_array_dims(codegen, node, accessors)
+
+        # Reuse the array type if we've already built one of this shape
+
+        type_id = f"array({base_type})[{','.join([str(_) for _ in reversed(dims)])}]"
+        existing = codegen.typemgr.custom_types.get(type_id, None)
+        if existing is not None:
+            return existing
+
+        new = AkiArray(codegen.module)
+
+        array_type = base_type.llvm_type
+        array_type.akitype = base_type
+        array_type.akinode = node
+
+        subaccessors = []
+
+        for accessor_dimension in reversed(dims):
             array_type = ir.ArrayType(array_type, accessor_dimension)
             subaccessors.append(accessor_dimension)
 
             subakitype = AkiArray(codegen.module)
             subakitype.llvm_type = array_type
+            subakitype.rank = len(subaccessors)
             subakitype.type_id = (
                 f"array({base_type})[{','.join([str(_) for _ in subaccessors])}]"
             )
@@ -500,10 +541,10 @@ class AkiArray(AkiObject, AkiType):
             array_type.akinode = node
 
         new.llvm_type = array_type
-        new.type_id = f"array({base_type})[{','.join([str(_) for _ in subaccessors])}]"
+        new.rank = len(subaccessors)
+        new.type_id = type_id
 
-        codegen.typemgr.add_type(new.type_id, new, codegen.module)
-        return new
+        return codegen.typemgr.add_type(new.type_id, new, codegen.module)
 
     def default(self, codegen, node):
         return None
@@ -511,22 +552,37 @@ class AkiArray(AkiObject, AkiType):
     def op_index(self, codegen, node, expr):
         current = expr
         akitype_loc = current.type.pointee
-        indices = [_int(0)]
-        for _ in node.accessors.accessors:
+        accessors = node.accessors.accessors
+        if len(accessors) > self.rank:
+            raise AkiTypeErr(
+                node,
+                codegen.text,
+                f"Too many dimensions for array access (array has {self.rank})",
+            )
+        indices = [_int(0), *map(codegen._codegen, accessors)]
+
+        # Only constant indices known to be within the array bounds
+        # can be marked as inbounds.
+
+        inbounds = True
+        for index in indices[1:]:
+            if inbounds and not (
+                isinstance(index, ir.Constant)
+                and isinstance(index.constant, int)
+                and 0 <= index.constant < akitype_loc.count
+            ):
+                inbounds = False
             akitype_loc = akitype_loc.element
-            akitype = akitype_loc.akitype
-            index = codegen._codegen(_)
-            indices.append(index)
-        result = codegen.builder.gep(current, indices)
+        akitype = akitype_loc.akitype
+        result = codegen.builder.gep(current, indices, inbounds=inbounds)
         result.akitype = akitype
         result.akinode = node
         return result
 
     def c_data(self, codegen, node):
-        obj_ptr = codegen.builder.bitcast(
-            node, codegen.types["u_mem"].llvm_type.as_pointer(0)
-        )
-        obj_ptr.akitype = codegen.typemgr.as_ptr(codegen.types["u_mem"])
+        u_mem_ptr = codegen.typemgr.u_mem_ptr
+        obj_ptr = codegen.builder.bitcast(node, u_mem_ptr.llvm_type)
+        obj_ptr.akitype = u_mem_ptr
         obj_ptr.akinode = node.akinode
         return obj_ptr
 
@@ -542,6 +598,10 @@ class AkiString(AkiObject, AkiType):
 
     bin_ops = {"+": "add"}
 
+    # GEP paths to the data pointer and the header length field
+    data_index = _gep_index(0, 1)
+    length_index = _gep_index(0, 0, AkiObject.LENGTH)
+
     def __init__(self, module):
         self.module = module
         self.llvm_type_base = module.context.get_identified_type(".str")
@@ -588,27 +648,35 @@ class AkiString(AkiObject, AkiType):
         return result2
 
     def data(self, text):
-        data = bytearray((text + "\x00").encode("utf8"))
+        data = bytearray(text.encode("utf8"))
+        data.append(0)
         data_array = ir.ArrayType(self.module.types["byte"].llvm_type, len(data))
         return data, data_array
 
     def c_data(self, codegen, node):
-        obj_ptr = codegen.builder.gep(node, [_int(0), _int(1)])
+        obj_ptr = codegen.builder.gep(node, self.data_index, inbounds=True)
         obj_ptr = codegen.builder.load(obj_ptr)
-        obj_ptr.akitype = codegen.typemgr.as_ptr(codegen.types["u_mem"])
+        obj_ptr.akitype = codegen.typemgr.u_mem_ptr
         obj_ptr.akinode = node.akinode
         return obj_ptr
 
     def c_size(self, codegen, node, llvm_obj):
-        obj_ptr = codegen.builder.gep(
-            llvm_obj, [_int(0), _int(0), _int(AkiObject.LENGTH)]
-        )
+        # String literals know their length at compile time
+        length = getattr(llvm_obj, "c_length", None)
+        if length is not None:
+            return codegen._codegen(Constant(node, length, codegen.types["u_size"]))
+        obj_ptr = codegen.builder.gep(llvm_obj, self.length_index, inbounds=True)
         obj_ptr = codegen.builder.load(obj_ptr)
         obj_ptr.akitype = codegen.types["u_size"]
         obj_ptr.akinode = llvm_obj.akinode
         return obj_ptr
 
 
+# Target data objects by data layout string.
+# These are kept outside of the type manager so it stays serializable.
+_target_data: dict = {}
+
+
 class AkiTypeMgr:
 
     # These do not rely on any particular architecture,
@@ -647,6 +715,10 @@ class AkiTypeMgr:
 
         self.module = module
 
+        # ABI sizes and alignments of LLVM types, computed on demand
+        self._abi_sizes: dict = {}
+        self._abi_alignments: dict = {}
+
         # Obtain pointer size from LLVM target
         self._byte_width = ir.PointerType(ir.IntType(bytesize)).get_abi_size(
             self.target_data()
@@ -659,7 +731,32 @@ class AkiTypeMgr:
 
     # Do not move this, otherwise we can't serialize the type mgr
     def target_data(self):
-        return binding.create_target_data(self.module.data_layout)
+        data_layout = self.module.data_layout
+        target_data = _target_data.get(data_layout, None)
+        if target_data is None:
+            target_data = binding.create_target_data(data_layout)
+            _target_data[data_layout] = target_data
+        return target_data
+
+    def abi_size(self, llvm_type):
+        """
+        Return the ABI size, in bytes, of an LLVM type.
+        """
+        size = self._abi_sizes.get(llvm_type, None)
+        if size is None:
+            size = llvm_type.get_abi_size(self.target_data())
+            self._abi_sizes[llvm_type] = size
+        return size
+
+    def abi_alignment(self, llvm_type):
+        """
+        Return the ABI alignment, in bytes, of an LLVM type.
+        """
+        alignment = self._abi_alignments.get(llvm_type, None)
+        if alignment is None:
+            alignment = llvm_type.get_abi_alignment(self.target_data())
+            self._abi_alignments[llvm_type] = alignment
+        return alignment
 
     def reset(self):
         # Initialize the type map from the base type list,
@@ -667,6 +764,9 @@ class AkiTypeMgr:
 
         self.custom_types = {}
 
+        # Pointer types, by base type ID and literal-ness
+        self._ptr_types: dict = {}
+
         self.enum_id_ctr = 0
         self.enum_ids = {}
 
@@ -696,10 +796,18 @@ class AkiTypeMgr:
             self.enum_ids[self.enum_id_ctr] = _
             self.enum_id_ctr += 1
 
-    def as_ptr(self, *a, **ka):
-        new = self._ptr.new(*a, **ka)
-        # TODO: move this into the actual `new` method?
-        self.add_type(new.type_id, new, self.module)
+        # Raw memory pointer, used for C data access
+        self.u_mem_ptr = self.as_ptr(self.types["u_mem"])
+
+    def as_ptr(self, base_type, literal_ptr=False):
+        key = (base_type.type_id, literal_ptr)
+        new = self._ptr_types.get(key, None)
+        if new is None:
+            new = self._ptr.new(base_type, literal_ptr)
+            # TODO: move this into the actual `new` method?
+            registered = self.add_type(new.type_id, new, self.module)
+            new.enum_id = registered.enum_id
+            self._ptr_types[key] = new
         return new
 
     def add_type(self, type_name: str, type_ref: AkiType, module_ref):
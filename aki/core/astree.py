@@ -9,7 +9,6 @@ class ASTNode:
     """
 
     def __init__(self, index):
-        self.child = None
         self.index = index
 
     def __eq__(self, other):
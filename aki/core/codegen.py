@@ -7,7 +7,7 @@ from core.akitypes import (
     AkiTypeMgr,
     AkiPointer,
     AkiBaseInt,
-    _int,
+    _gep_index,
 )
 
 from core.astree import (
@@ -15,6 +15,7 @@ from core.astree import (
     VarTypeName,
     VarTypeFunc,
     VarTypePtr,
+    VarTypeAccessor,
     BinOpComparison,
     Constant,
     IfExpr,
@@ -87,6 +88,21 @@ class AkiCodeGen:
     Code generation module for Akilang.
     """
 
+    # Branch weights for loop tests (stay in loop, exit loop).
+    loop_branch_weights = [128, 1]
+
+    # Functions with this many instructions or fewer are always inlined,
+    # unless a decorator says otherwise. This is a count of unoptimized
+    # IR instructions, not LLVM's inline cost; anything larger is left
+    # to the LLVM inliner and the "inlining_threshold" setting.
+    inline_threshold = 16
+
+    # Function attributes inferred from the calls a function makes.
+    _inferred_attributes = ("nounwind", "norecurse")
+
+    # Aggregates larger than this many bytes are zeroed with memset.
+    memset_threshold = 64
+
     def __init__(
         self,
         module: Optional[ir.Module] = None,
@@ -130,6 +146,26 @@ class AkiCodeGen:
 
         self.repl = None
 
+        # Resolved module-level call targets, by name.
+        self._call_cache: dict = {}
+
+        # Frequently used scalar constants, by type and value.
+        self._const_cache: dict = {}
+
+        # Function types for prototypes, by signature.
+        self._ftype_cache: dict = {}
+
+        # Builders for function entry blocks and bodies,
+        # repositioned for each function.
+        self._entry_builder = ir.IRBuilder()
+        self._body_builder = ir.IRBuilder()
+
+        # String literal globals, by content.
+        self._string_pool: dict = {}
+
+        # Declaration of `llvm.memset`, created on first use.
+        self._memset_fn = None
+
     def _const_counter(self):
         self.typemgr.const_enum += 1
         return self.typemgr.const_enum
@@ -158,12 +194,25 @@ class AkiCodeGen:
         """
         Dispatch function for codegen based on AST classes.
         """
-        if isinstance(node, VarTypeNode):
-            _ = self._get_vartype(node)
-            return self._codegen_Name(node)
-        method = f"_codegen_{node.__class__.__name__}"
-        result = getattr(self, method)(node)
-        return result
+        node_class = node.__class__
+        method = self._codegen_dispatch.get(node_class, None)
+        if method is None:
+            if issubclass(node_class, VarTypeNode):
+                method = AkiCodeGen._codegen_VarTypeNode
+            else:
+                method = getattr(AkiCodeGen, f"_codegen_{node_class.__name__}")
+            self._codegen_dispatch[node_class] = method
+        return method(self, node)
+
+    # Codegen methods by AST class, filled in as classes are encountered.
+    _codegen_dispatch: dict = {}
+
+    def _codegen_VarTypeNode(self, node):
+        """
+        Type nodes used as expressions yield their type enum.
+        """
+        _ = self._get_vartype(node)
+        return self._codegen_Name(node)
 
     def eval_to_result(self, node):
         # TODO: move this to AST phase,
@@ -210,7 +259,8 @@ class AkiCodeGen:
                 return name
 
         # Next, look in the globals:
-        name = self.module.globals.get(name_to_find, None)
+        module_globals = self.module.globals
+        name = module_globals.get(name_to_find, None)
         if name is not None:
             return name
 
@@ -228,7 +278,7 @@ class AkiCodeGen:
                 # then copy it into the module.
 
                 if isinstance(name, ir.GlobalVariable):
-                    self.module.globals[name_to_find] = name
+                    module_globals[name_to_find] = name
                     return name
 
                 # otherwise, this is a function.
@@ -238,9 +288,12 @@ class AkiCodeGen:
                 # copy aki data for function
                 link.akinode = name.akinode
                 link.akitype = name.akitype
+                link.arg_types = name.arg_types
+                link.call_name = name.call_name
+                link.calling_convention = name.calling_convention
                 for n_arg, l_arg in zip(name.args, link.args):
                     l_arg.akinode = n_arg.akinode
-                return name
+                return link
 
         if name is None:
             raise AkiNameErr(
@@ -261,6 +314,14 @@ class AkiCodeGen:
         allocation = self.fn.allocator.alloca(llvm_type, size, name)
         return allocation
 
+    def _store(self, val, ptr):
+        """
+        Store a value to a variable, with the ABI alignment of its type.
+        """
+        return self.builder.store(
+            val, ptr, align=self.typemgr.abi_alignment(val.type)
+        )
+
     def _delete_var(self, name):
         """
         Deletes a variable from the local scope.
@@ -284,10 +345,10 @@ class AkiCodeGen:
             return self.typemgr._default
         if isinstance(node, AkiType):
             return node
-        try:
-            return getattr(self, f"_get_vartype_{node.__class__.__name__}")(node)
-        except AttributeError:
+        handler = self._vartype_handlers.get(node.__class__, None)
+        if handler is None:
             raise AkiTypeErr(node, self.text, f"Object is not a type descriptor")
+        return handler(self, node)
 
     def _get_vartype_Name(self, node):
         # TODO: this is a shim to get around the fact that we have
@@ -342,6 +403,14 @@ class AkiCodeGen:
 
         return aki_node
 
+    _vartype_handlers = {
+        Name: _get_vartype_Name,
+        VarTypeName: _get_vartype_VarTypeName,
+        VarTypeAccessor: _get_vartype_VarTypeAccessor,
+        VarTypePtr: _get_vartype_VarTypePtr,
+        VarTypeFunc: _get_vartype_VarTypeFunc,
+    }
+
     def _codegen_VarTypeFunc(self, node):
         """
         Traps expresson-level instances of the `func` type.
@@ -424,16 +493,25 @@ class AkiCodeGen:
         Takes an LLVM instruction result of a scalar type
         and converts it to a boolean type.
         """
-        result = self._codegen(
-            BinOpComparison(
-                node,
-                "!=",
-                LLVMNode(node, expr.akitype, expr),
-                Constant(node, expr.akitype.default(self, node), expr.akitype),
-            )
-        )
+        akitype = expr.akitype
+        zero = self._typed_const(akitype, akitype.default(self, node))
+        result = self._compare(node, "!=", expr, zero)
+        result.akitype = self.types["bool"]
+        result.akinode = node
         return result
 
+    def _typed_const(self, akitype, value):
+        """
+        Return a (shared) LLVM constant of a given Aki type.
+        """
+        key = (akitype.type_id, value)
+        const = self._const_cache.get(key, None)
+        if const is None:
+            const = ir.Constant(akitype.llvm_type, value)
+            const.akitype = akitype
+            self._const_cache[key] = const
+        return const
+
     def _is_type(self, node, expr, other_type):
         akitype = getattr(expr, "akitype", None)
         if not akitype:
@@ -452,7 +530,9 @@ class AkiCodeGen:
         self._is_type(node.rhs, rhs, AkiType)
         rhs_atype = rhs.akitype
 
-        if lhs_atype != rhs_atype:
+        # Most operands share the same type object, so check identity first
+
+        if lhs_atype is not rhs_atype and lhs_atype != rhs_atype:
 
             error = f'"{CMD}{lhs.akinode.name}{REP}" ({CMD}{lhs_atype}{REP}) and "{CMD}{rhs.akinode.name}{REP}" ({CMD}{rhs_atype}{REP}) do not have compatible types for operation "{CMD}{node.op}{REP}"'
 
@@ -471,16 +551,16 @@ class AkiCodeGen:
     def _codegen_Decorator(self, node):
         self.decorator_stack.append(node)
 
-        _ = getattr(self, f"_decorator_{node.name}_enter", None)
+        _ = self._decorators.get(node.name, None)
 
         if not _:
             raise AkiSyntaxErr(
                 node, self.text, f'Decorator "{CMD}{node.name}{REP}" not recognized'
             )
 
-        dec_enter = _()
+        dec_enter = _[0](self)
         result = self._codegen(node.expr_block)
-        dec_exit = getattr(self, f"_decorator_{node.name}_exit")()
+        dec_exit = _[1](self)
         self.decorator_stack.pop()
         return result
 
@@ -577,15 +657,29 @@ class AkiCodeGen:
 
         # Generate function prototype.
 
-        f_type = ir.FunctionType(
-            return_type.llvm_type, func_args, var_arg=self.fn.varargs is not None
-        )
+        # Signatures with an explicit return type never change,
+        # so those function types can be shared.
+        # Inferred return types are patched later, so they get their own.
+
+        var_arg = self.fn.varargs is not None
+
+        if node.return_type_unset:
+            f_type = ir.FunctionType(return_type.llvm_type, func_args, var_arg=var_arg)
+        else:
+            f_type_key = (return_type.llvm_type, tuple(func_args), var_arg)
+            f_type = self._ftype_cache.get(f_type_key, None)
+            if f_type is None:
+                f_type = ir.FunctionType(
+                    return_type.llvm_type, func_args, var_arg=var_arg
+                )
+                self._ftype_cache[f_type_key] = f_type
         f_type.return_type.akitype = return_type
 
         for p_arg, n_arg in zip(f_type.args, node.arguments):
             p_arg.akinode = n_arg
 
         proto = ir.Function(self.module, f_type, name=node.name)
+        self._call_cache.pop(node.name, None)
 
         proto.calling_convention = "fastcc" if self.fn.varargs is None else "ccc"
 
@@ -606,6 +700,12 @@ class AkiCodeGen:
         proto.akinode = node
         proto.akitype = function_type
 
+        # Argument types, for checking calls against this function
+        proto.arg_types = tuple(f_type.args)
+
+        # Name for call instructions to this function
+        proto.call_name = f"{proto.name}.call"
+
         # Add Aki type metadata - not used yet, but eventually
 
         # aki_type_metadata = self.module.add_metadata([str(proto.akitype)])
@@ -629,7 +729,7 @@ class AkiCodeGen:
             # make sure our return has the proper type
 
             if not self.fn.fn.akinode.return_type_unset:
-                if val.akitype != self.fn.return_value.akitype:
+                if val.akitype != self.fn.fn.akitype.return_type:
                     raise LocalException
 
             # otherwise, if this is the first early exit,
@@ -649,10 +749,10 @@ class AkiCodeGen:
             raise AkiTypeErr(
                 node,
                 self.text,
-                f"Return value type ({CMD}{val.akitype}{REP}) does not match function signature return type ({CMD}{self.fn.return_value.akitype}{REP})",
+                f"Return value type ({CMD}{val.akitype}{REP}) does not match function signature return type ({CMD}{self.fn.fn.akitype.return_type}{REP})",
             )
 
-        self.builder.store(val, self.fn.return_value)
+        self.builder.store(val, self._return_slot(node))
         self.builder.branch(self.fn.exit_block)
         return val
 
@@ -660,6 +760,67 @@ class AkiCodeGen:
         # more for completeness on our end than because it's ever actually
         # used in a program's flow.
 
+    def _zero_fill(self, var_ptr, zero_value):
+        """
+        Zero-initialize a variable slot.
+        Large aggregates are cleared with `llvm.memset`,
+        everything else with a plain store.
+        """
+        llvm_type = zero_value.type
+        if isinstance(llvm_type, ir.Aggregate):
+            size = self.typemgr.abi_size(llvm_type)
+            if size > self.memset_threshold:
+                mem_ptr = self.builder.bitcast(
+                    var_ptr, self.typemgr.u_mem_ptr.llvm_type
+                )
+                self.builder.call(
+                    self._memset(),
+                    [
+                        mem_ptr,
+                        ir.Constant(self.types["u_mem"].llvm_type, 0),
+                        ir.Constant(self.types["u_size"].llvm_type, size),
+                        ir.Constant(ir.IntType(1), 0),
+                    ],
+                )
+                return
+        self.builder.store(zero_value, var_ptr)
+
+    def _memset(self):
+        """
+        Get the `llvm.memset` intrinsic for this module.
+        """
+        if self._memset_fn is None:
+            mem_ptr_type = self.typemgr.u_mem_ptr.llvm_type
+            size_type = self.types["u_size"].llvm_type
+            self._memset_fn = self.module.declare_intrinsic(
+                "llvm.memset",
+                [mem_ptr_type, size_type],
+                ir.FunctionType(
+                    ir.VoidType(),
+                    [
+                        mem_ptr_type,
+                        self.types["u_mem"].llvm_type,
+                        size_type,
+                        ir.IntType(1),
+                    ],
+                ),
+            )
+        return self._memset_fn
+
+    def _return_slot(self, node):
+        """
+        Get the return value holder and exit block for the current function,
+        creating them on first use.
+        """
+        if self.fn.return_value is None:
+            func = self.fn.fn
+            self.fn.return_value = self._alloca(
+                node, func.return_value.type, ".function_return_value"
+            )
+            self.fn.return_value.akitype = func.akitype.return_type
+            self.fn.exit_block = func.append_basic_block("exit")
+        return self.fn.return_value
+
     def _codegen_Function(self, node):
         """
         Generate an LLVM function from a `Function` AST node.
@@ -695,12 +856,15 @@ class AkiCodeGen:
                 # so it can be referenced if we need to throw an error
                 a.akitype = b.vartype.akitype
                 a.akinode = b
+            # External C functions never unwind through Aki code
+            func.attributes.add("nounwind")
             return func
 
         # Generate entry block and function body.
 
         self.entry_block = func.append_basic_block("entry")
-        self.fn.allocator = ir.IRBuilder(self.entry_block)
+        self.fn.allocator = self._entry_builder
+        self.fn.allocator.position_at_end(self.entry_block)
 
         # Add prototype arguments to function symbol table
         # and add references in function.
@@ -721,29 +885,25 @@ class AkiCodeGen:
             a.akinode = b
             # add the variable to the symbol table
             self.fn.symtab[b.name] = var_alloc
-            # store the default value to the variable
-            self.fn.allocator.store(a, var_alloc)
-
-        # Add return value holder.
 
-        self.fn.return_value = self._alloca(
-            node, func.return_value.type, ".function_return_value"
-        )
-
-        # Set Akitype values for the return value holder
-        # and for the function's actual return value.
+        # Set Akitype value for the function's actual return value.
+        # The return value holder and exit block are only created
+        # if the body has an early `return` (see `_return_slot`).
 
-        self.fn.return_value.akitype = func.akitype.return_type
         func.return_value.akitype = func.akitype.return_type
 
         # Create actual starting function block and codegen instructions.
 
-        self.fn.exit_block = func.append_basic_block("exit")
-
         self.body_block = func.append_basic_block("body")
-        self.builder = ir.IRBuilder(self.body_block)
+        self.builder = self._body_builder
         self.builder.position_at_start(self.body_block)
 
+        # Store the argument values to their variables.
+        # This is done in the body so the entry block holds only allocas.
+
+        for a in func.args:
+            self._store(a, self.fn.symtab[a.akinode.name])
+
         result = self._codegen(node.body)
 
         # If we have an empty function body,
@@ -777,8 +937,9 @@ class AkiCodeGen:
             r_type = result.akitype
 
             # Set the result holder
-            self.fn.return_value.type = r_type.llvm_type.as_pointer()
-            self.fn.return_value.akitype = r_type
+            if self.fn.return_value is not None:
+                self.fn.return_value.type = r_type.llvm_type.as_pointer()
+                self.fn.return_value.akitype = r_type
 
             # Set the actual type for the function return value
             # that we track locally in codegen
@@ -803,26 +964,57 @@ class AkiCodeGen:
         # If the function prototype and return type still don't agree,
         # throw an exception
 
-        if result.akitype != self.fn.return_value.akitype:
+        if result.akitype != func.akitype.return_type:
             raise AkiTypeErr(
                 node,
                 self.text,
-                f'Return value from function "{CMD}{func.name}{REP}" ({CMD}{result.akitype}{REP}) does not match function signature return type ({CMD}{self.fn.return_value.akitype}{REP})',
+                f'Return value from function "{CMD}{func.name}{REP}" ({CMD}{result.akitype}{REP}) does not match function signature return type ({CMD}{func.akitype.return_type}{REP})',
             )
 
-        # Add return value for function in exit block.
-        self.builder.store(result, self.fn.return_value)
+        if self.fn.exit_block is None:
 
-        # branch to exit, return the return value.
-        self.builder.branch(self.fn.exit_block)
-        self.builder.position_at_start(self.fn.exit_block)
-        self.builder.ret(self.builder.load(self.fn.return_value, ".ret"))
+            # No early exits, so return the result directly.
+            self.builder.ret(result)
+
+        else:
+
+            # Add return value for function in exit block.
+            self.builder.store(result, self.fn.return_value)
+
+            # branch to exit, return the return value.
+            self.builder.branch(self.fn.exit_block)
+            self.builder.position_at_start(self.fn.exit_block)
+            self.builder.ret(self.builder.load(self.fn.return_value, ".ret"))
 
         # Add a branch from the allocator to the body block.
         # We have to do this after generating the body to ensure
         # it comes after all the other allocation instructions.
         self.fn.allocator.branch(self.body_block)
 
+        # If no inlining preference was given by decorator,
+        # mark very small functions for inlining.
+
+        if self.decorator_context.get("inline", None) is None:
+            instr_count = sum(len(_.instructions) for _ in func.blocks)
+            if instr_count <= self.inline_threshold:
+                func.attributes.add("alwaysinline")
+
+        # A function that only calls functions known not to unwind
+        # or recurse can't either.
+
+        CallInstr, Function = ir.CallInstr, ir.Function
+
+        callees = [
+            _.callee
+            for block in func.blocks
+            for _ in block.instructions
+            if isinstance(_, CallInstr)
+        ]
+
+        for attr in self._inferred_attributes:
+            if all(isinstance(_, Function) and attr in _.attributes for _ in callees):
+                func.attributes.add(attr)
+
         # Reset function state handlers.
         self.fn = None
 
@@ -892,6 +1084,7 @@ class AkiCodeGen:
             # If no value ...
 
             value: Any = None
+            zero_value = None
 
             if _.val is None:
 
@@ -901,8 +1094,15 @@ class AkiCodeGen:
                     _.vartype = Name(_.index, self.typemgr._default.type_id)
 
                 _.akitype = self._get_vartype(_.vartype)
-                _.val = Constant(_.index, _.akitype.default(self, node), _.vartype)
-                value = _.val
+                default = _.akitype.default(self, node)
+
+                # Zero/null defaults can be stored as a constant directly
+
+                if default is None or isinstance(default, (int, float)):
+                    zero_value = ir.Constant(_.akitype.llvm_type, default)
+                else:
+                    _.val = Constant(_.index, default, _.vartype)
+                    value = _.val
 
             else:
 
@@ -943,19 +1143,40 @@ class AkiCodeGen:
             var_ptr.akinode = _
 
             if is_uni:
-                var_ptr.initializer = self._codegen(value)
+                if zero_value is not None:
+                    var_ptr.initializer = zero_value
+                else:
+                    var_ptr.initializer = self._codegen(value)
+
+                # Scalar constants can be used by value instead of loaded
+
+                if (
+                    is_const
+                    and not isinstance(_.akitype, AkiObject)
+                    and isinstance(var_ptr.initializer, ir.Constant)
+                ):
+                    var_ptr.const_value = var_ptr.initializer
             else:
 
                 # Store the variable in the function symbol table
                 self.fn.symtab[_.name] = var_ptr
 
-                # and store the value itself to the variable
-                # by way of an Assignment op
-                self._codegen(
+                if zero_value is not None:
+                    self._zero_fill(var_ptr, zero_value)
+                    continue
+
+                # and store the value itself to the variable,
+                # checking it as we would an Assignment op
+
+                val = self._codegen(value)
+                self._type_check_op(
                     Assignment(
                         _.index, "=", ObjectRef(_.index, Name(_.index, _.name)), value
-                    )
+                    ),
+                    var_ptr,
+                    val,
                 )
+                self._store(val, var_ptr)
 
     #################################################################
     # Control flow
@@ -974,43 +1195,57 @@ class AkiCodeGen:
         # another possibility: when generating calls in the AST,
         # intercept builtins from a central list and check them there
 
-        builtin = getattr(self, f"_builtins_{node.name}", None)
+        builtin = self._builtins.get(node.name, None)
         if builtin:
-            return builtin(node)
+            return builtin(self, node)
 
-        # check if this is a request for a type
-        # this will eventually go somewhere else
+        # Module-level functions we've already resolved can skip
+        # the type and name lookups, unless shadowed by a local.
+
+        call_func = None
+        if self.fn is None or node.name not in self.fn.symtab:
+            call_func = self._call_cache.get(node.name, None)
 
         try:
 
-            named_type = self._get_type_by_name(node.name)
+            if call_func is None:
 
-            if named_type is not None and not isinstance(named_type, AkiFunction):
+                # check if this is a request for a type
+                # this will eventually go somewhere else
 
-                if len(node.arguments) != 1:
-                    # Create a fake function definition to handle the error
-                    call_func = lambda: None
-                    call_func.akinode = node
-                    call_func.args = (
-                        [Argument(node, "vartype", VarTypeName(node, "type"))],
-                    )
+                named_type = self._get_type_by_name(node.name)
 
-                    raise LocalException
+                if named_type is not None and not isinstance(
+                    named_type, AkiFunction
+                ):
 
-                arg = node.arguments[0]
-                type_new_builtin = getattr(self, f"_builtins_{node.name}_init", None)
+                    if len(node.arguments) != 1:
+                        # Create a fake function definition to handle the error
+                        call_func = lambda: None
+                        call_func.akinode = node
+                        call_func.args = (
+                            [Argument(node, "vartype", VarTypeName(node, "type"))],
+                        )
 
-                if type_new_builtin:
-                    return type_new_builtin(arg)
-                else:
-                    raise AkiTypeErr(
-                        arg,
-                        self.text,
-                        f'Can\'t use "{CMD}{arg.val}{REP}" as initializer for type "{CMD}{named_type.type_id}{REP}"',
+                        raise LocalException
+
+                    arg = node.arguments[0]
+                    type_new_builtin = getattr(
+                        self, f"_builtins_{node.name}_init", None
                     )
 
-            call_func = self._name(node, node.name)
-            args = []
+                    if type_new_builtin:
+                        return type_new_builtin(arg)
+                    else:
+                        raise AkiTypeErr(
+                            arg,
+                            self.text,
+                            f'Can\'t use "{CMD}{arg.val}{REP}" as initializer for type "{CMD}{named_type.type_id}{REP}"',
+                        )
+
+                call_func = self._name(node, node.name)
+                if isinstance(call_func, ir.Function):
+                    self._call_cache[node.name] = call_func
 
             # If this is a function pointer ...
 
@@ -1024,7 +1259,7 @@ class AkiCodeGen:
                 final_call_func = load_call_func
 
                 # set the description to use in the call
-                call_func_name = node.name
+                call_func_name = f"{node.name}.call"
 
                 # use the type ID for the function to get a signature
                 # that we can use for checking the arguments.
@@ -1044,82 +1279,92 @@ class AkiCodeGen:
                     )
                 call_func = original_call_func
             else:
-                call_func_name = call_func.name
+                call_func_name = call_func.call_name
                 final_call_func = call_func
 
             # If we have too many arguments,
             # and we're not processing a vararg function, give up
 
-            if (
-                len(node.arguments) > len(call_func.args)
-                and not call_func.ftype.var_arg
-            ):
-                raise LocalException
-
-            total_args = max(len(node.arguments), len(call_func.args))
-            for _ in range(total_args):
-
-                # if we're supplying more arguments than are available
-                # to the called function,
-                # see if this is a vararg
+            arg_types = call_func.arg_types
+            supplied_args = len(node.arguments)
+            expected_args = len(arg_types)
 
-                if _ > len(call_func.args) - 1:
-                    if call_func.ftype.var_arg:
-                        arg = node.arguments[_]
-                        arg_val = self._codegen(arg)
-                        args.append(arg_val)
-                        continue
-                    else:
-                        raise LocalException
+            if supplied_args > expected_args and not call_func.ftype.var_arg:
+                raise LocalException
 
-                f_arg = call_func.args[_]
+            # If we're out of supplied arguments,
+            # the function must have defaults for the rest.
 
-                # If we're out of supplied arguments,
-                # see if the function has default args.
+            default_args = call_func.args[supplied_args:]
 
-                if _ > len(node.arguments) - 1:
-                    default_arg_value = f_arg.akinode.default_value
-                    if default_arg_value is None:
-                        raise LocalException
-                    arg_val = self._codegen(default_arg_value)
-                    args.append(arg_val)
-                    continue
+            for f_arg in default_args:
+                if f_arg.akinode.default_value is None:
+                    raise LocalException
 
-                # If we still have supplied arguments,
-                # use them instead.
+        except LocalException:
+            self._call_arg_count_err(node, call_func)
 
-                arg = node.arguments[_]
-                arg_val = self._codegen(arg)
+        # Generate the supplied arguments, including any varargs.
 
-                if arg_val.type != call_func.args[_].type:
-                    raise AkiTypeErr(
-                        arg,
-                        self.text,
-                        f'Value "{CMD}{arg.name}{REP}" of type "{CMD}{arg_val.akitype}{REP}" does not match {CMD}{node.name}{REP} argument {CMD}{_+1}{REP} of type "{CMD}{call_func.args[_].akinode.vartype.akitype}{REP}"',
-                    )
+        args = [self._codegen(_) for _ in node.arguments]
 
-                args.append(arg_val)
+        # Check the supplied (non-vararg) arguments against the signature.
+        # The first mismatch, in argument order, is the one reported.
 
-        # TODO: list in error which arguments are optional, along with their defaults
+        checked_args = min(supplied_args, expected_args)
+        supplied_types = tuple(_.type for _ in args[:checked_args])
 
-        except LocalException:
-            args = "\n".join(
-                [
-                    f"arg {index+1} = {CMD}{_.name}{_.vartype.akitype}{REP}"
-                    for index, _ in enumerate(call_func.akinode.arguments)
-                ]
-            )
-            raise AkiSyntaxErr(
-                node,
-                self.text,
-                f'Function call to "{CMD}{node.name}{REP}" expected {CMD}{len(call_func.args)}{REP} arguments but got {CMD}{len(node.arguments)}{REP}\n{args}',
+        if supplied_types != arg_types[:checked_args]:
+            mismatch = next(
+                index
+                for index, _ in enumerate(zip(supplied_types, arg_types))
+                if _[0] != _[1]
             )
+            self._call_arg_type_err(node, call_func, args, mismatch)
+
+        for f_arg in default_args:
+            args.append(self._codegen(f_arg.akinode.default_value))
 
-        call = self.builder.call(final_call_func, args, call_func_name + ".call")
+        call = self.builder.call(
+            final_call_func,
+            args,
+            call_func_name,
+            cconv=call_func.calling_convention,
+        )
         call.akitype = call_func.akitype.return_type
         call.akinode = call_func.akinode
         return call
 
+    def _call_arg_type_err(self, node, call_func, args, index):
+        """
+        Report a mismatched argument type in a function call.
+        """
+        arg = node.arguments[index]
+        raise AkiTypeErr(
+            arg,
+            self.text,
+            f'Value "{CMD}{arg.name}{REP}" of type "{CMD}{args[index].akitype}{REP}" does not match {CMD}{node.name}{REP} argument {CMD}{index+1}{REP} of type "{CMD}{call_func.args[index].akinode.vartype.akitype}{REP}"',
+        )
+
+    def _call_arg_count_err(self, node, call_func):
+        """
+        Report a wrong number of arguments in a function call.
+        """
+
+        # TODO: list in error which arguments are optional, along with their defaults
+
+        args = "\n".join(
+            [
+                f"arg {index+1} = {CMD}{_.name}{_.vartype.akitype}{REP}"
+                for index, _ in enumerate(call_func.akinode.arguments)
+            ]
+        )
+        raise AkiSyntaxErr(
+            node,
+            self.text,
+            f'Function call to "{CMD}{node.name}{REP}" expected {CMD}{len(call_func.args)}{REP} arguments but got {CMD}{len(node.arguments)}{REP}\n{args}',
+        )
+
     def _codegen_Break(self, node):
         """
         Codegen a `break` action.
@@ -1146,7 +1391,8 @@ class AkiCodeGen:
         self.builder.branch(loop_cond)
         self.builder.position_at_start(loop_cond)
         while_test = self._codegen(node.while_value)
-        self.builder.cbranch(while_test, loop_body, loop_exit)
+        branch = self.builder.cbranch(while_test, loop_body, loop_exit)
+        branch.set_weights(self.loop_branch_weights)
         self.builder.position_at_start(loop_body)
         self.fn.breakpoints.append(loop_exit)
         while_body = self._codegen(node.while_expr)
@@ -1240,7 +1486,8 @@ class AkiCodeGen:
             loop = self.builder.append_basic_block("loop")
             loop_exit = self.builder.append_basic_block("loop_exit")
             self.fn.breakpoints.append(loop_exit)
-            self.builder.cbranch(loop_condition, loop, loop_exit)
+            branch = self.builder.cbranch(loop_condition, loop, loop_exit)
+            branch.set_weights(self.loop_branch_weights)
             self.builder.position_at_start(loop)
             loop_body = self._codegen(node.body)
             loop_result = self.fn.allocator.alloca(loop_body.type)
@@ -1308,27 +1555,21 @@ class AkiCodeGen:
 
         then_result = self._codegen(node.then_expr)
 
-        if is_when_expr:
-            if_result = self._alloca(
-                node.if_expr, if_expr.akitype.llvm_type, ".when_result"
-            )
-            self.builder.store(if_expr, if_result)
-            result_akitype = if_expr.akitype
-        else:
+        # A `when` yields its condition, which is already computed
+        # ahead of both branches, so it needs no result slot.
+
+        if not is_when_expr:
             if_result = self._alloca(
                 node.then_expr, then_result.akitype.llvm_type, ".if_result"
             )
             self.builder.store(then_result, if_result)
-            result_akitype = then_result.akitype
 
         self.builder.branch(exit_block)
 
         if node.else_expr:
             self.builder.position_at_start(else_block)
             else_result = self._codegen(node.else_expr)
-            if is_when_expr:
-                self.builder.store(if_expr, if_result)
-            else:
+            if not is_when_expr:
                 if then_result.akitype != else_result.akitype:
                     raise AkiTypeErr(
                         node.then_expr,
@@ -1340,14 +1581,22 @@ class AkiCodeGen:
 
         self.builder.position_at_start(exit_block)
 
+        if is_when_expr:
+            result = if_expr
+            # Constants may be shared, so give the result its own copy
+            if isinstance(result, ir.Constant):
+                result = ir.Constant(result.type, result.constant)
+            result.akitype = if_expr.akitype
+            result.akinode = node
+            result.akinode.vartype = result.akitype.type_id
+            result.akinode.name = f'"when" expr'
+            return result
+
         result = self.builder.load(if_result)
-        result.akitype = result_akitype
+        result.akitype = then_result.akitype
         result.akinode = node
         result.akinode.vartype = result.akitype.type_id
-        if is_when_expr:
-            result.akinode.name = f'"when" expr'
-        else:
-            result.akinode.name = f'"if" expr'
+        result.akinode.name = f'"if" expr'
         return result
 
     def _codegen_WhenExpr(self, node):
@@ -1366,9 +1615,12 @@ class AkiCodeGen:
         switch_node = self.builder.switch(value, default_block)
         exit_block = self.builder.append_basic_block(".select_exit")
 
+        builder = self.builder
+        value_type = value.akitype
+
         for index, _ in enumerate(node.case_list):
-            case_block = self.builder.append_basic_block(f".select_{index}")
-            self.builder.position_at_start(case_block)
+            case_block = builder.append_basic_block(f".select_{index}")
+            builder.position_at_start(case_block)
             case_value = self._codegen(_.case_value)
             if not isinstance(case_value, ir.Constant) and not isinstance(
                 case_value.type, ir.IntType
@@ -1378,7 +1630,10 @@ class AkiCodeGen:
                     self.text,
                     f'"{CMD}{_.case_value.name}{case_value.akitype}{REP}" cannot be used as a "{CMD}case{REP}" node; it must be a compile-time integer constant',
                 )
-            if case_value.akitype != value.akitype:
+            if (
+                case_value.akitype is not value_type
+                and case_value.akitype != value_type
+            ):
                 raise AkiTypeErr(
                     _.case_value,
                     self.text,
@@ -1387,7 +1642,7 @@ class AkiCodeGen:
 
             switch_node.add_case(case_value, case_block)
             self._codegen(_.case_expr)
-            self.builder.branch(exit_block)
+            builder.branch(exit_block)
 
         self.builder.position_at_start(default_block)
         if node.default_case:
@@ -1445,9 +1700,7 @@ class AkiCodeGen:
         if not self._is_type(node, operand, AkiBool):
             operand = self._scalar_as_bool(node, operand)
 
-        xor = self.builder.xor(
-            operand, self._codegen(Constant(node, 1, operand.akitype))
-        )
+        xor = self.builder.xor(operand, self._typed_const(operand.akitype, 1))
 
         xor.akitype = self.types["bool"]
         # xor.akinode = node
@@ -1466,8 +1719,22 @@ class AkiCodeGen:
         rhs = self._codegen(node.rhs)
 
         # Type checking for operation
-        lhs_atype, rhs_atype = self._type_check_op(node, lhs, rhs)
-        signed_op = lhs_atype.signed
+        self._type_check_op(node, lhs, rhs)
+
+        instr = self._compare(node, node.op, lhs, rhs)
+
+        instr.akitype = self.types["bool"]
+        instr.akinode = node
+        instr.akinode.name = f'op "{node.op}"'
+
+        return instr
+
+    def _compare(self, node, op, lhs, rhs):
+        """
+        Emit the comparison instruction for an op on two values
+        of the same Aki type.
+        """
+        lhs_atype = lhs.akitype
 
         # Find and add appropriate instruction
 
@@ -1476,7 +1743,7 @@ class AkiCodeGen:
             if instr_name is None:
                 raise LocalException
             instr_type = getattr(self.builder, instr_name)
-            op_name = lhs_atype.comp_ops.get(node.op, None)
+            op_name = lhs_atype.comp_ops.get(op, None)
             if op_name is None:
                 raise LocalException
 
@@ -1484,16 +1751,10 @@ class AkiCodeGen:
             raise AkiOpError(
                 node,
                 self.text,
-                f'Comparison operator "{CMD}{node.op}{REP}" not supported for type "{CMD}{lhs_atype}{REP}"',
+                f'Comparison operator "{CMD}{op}{REP}" not supported for type "{CMD}{lhs_atype}{REP}"',
             )
 
-        instr = instr_type(node.op, lhs, rhs, op_name)
-
-        instr.akitype = self.types["bool"]
-        instr.akinode = node
-        instr.akinode.name = f'op "{node.op}"'
-
-        return instr
+        return instr_type(op, lhs, rhs, op_name)
 
     def _codegen_BinOp(self, node):
         """
@@ -1540,8 +1801,10 @@ class AkiCodeGen:
         # TODO: This assumes the left-hand side will always have the correct
         # type information to be propagated. Need to confirm this.
 
-    def _codegen_AccessorExpr(self, node, load=True):
-        # XXX: this should be a direct extraction codegen
+    def _accessor_ref(self, node):
+        """
+        Generate a pointer to the element of an `AccessorExpr`.
+        """
         expr = self._name(node.expr, node.expr.name)
         index = getattr(expr.akitype, "op_index", None)
         if index is None:
@@ -1549,13 +1812,16 @@ class AkiCodeGen:
                 node.expr, self.text, "No index operator found for this type"
             )
         result = index(self, node, expr)
-        if load:
-            t = result.akitype
-            result = self.builder.load(result)
-            result.akitype = t
-            result.akinode = node
-            result.akinode.vartype = result.akitype.type_id
-        result.akinode.name = node.expr.name + "[]"
+        node.name = node.expr.name + "[]"
+        return result
+
+    def _codegen_AccessorExpr(self, node):
+        # XXX: this should be a direct extraction codegen
+        ref = self._accessor_ref(node)
+        result = self.builder.load(ref)
+        result.akitype = ref.akitype
+        result.akinode = node
+        node.vartype = ref.akitype.type_id
         return result
 
     #################################################################
@@ -1563,15 +1829,28 @@ class AkiCodeGen:
     #################################################################
 
     def _codegen_ObjectRef(self, node):
-        if isinstance(node.expr, Name):
-            return self._name(node.expr, node.expr.name)
-        if isinstance(node.expr, AccessorExpr):
-            return self._codegen_AccessorExpr(node.expr, False)
-        raise AkiOpError(
-            node,
-            self.text,
-            f'Assignment target "{CMD}{node.lhs}{REP}" must be a variable',
-        )
+        op = self._objref_targets.get(node.expr.__class__, None)
+        if op is None:
+            raise AkiOpError(
+                node,
+                self.text,
+                f'Assignment target "{CMD}{node.lhs}{REP}" must be a variable',
+            )
+        return op(self, node.expr)
+
+    def _objref_Name(self, expr):
+        """
+        Reference to a named variable.
+        """
+        return self._name(expr, expr.name)
+
+    def _objref_AccessorExpr(self, expr):
+        """
+        Reference to an indexed element of a variable.
+        """
+        return self._accessor_ref(expr)
+
+    _objref_targets = {Name: _objref_Name, AccessorExpr: _objref_AccessorExpr}
 
     def _codegen_ObjectValue(self, node):
         pass
@@ -1601,7 +1880,7 @@ class AkiCodeGen:
             )
 
         self._type_check_op(node, ptr, val)
-        self.builder.store(val, ptr)
+        self._store(val, ptr)
 
         return val
 
@@ -1614,6 +1893,20 @@ class AkiCodeGen:
         This will eventually no longer be its own node, I think
         """
 
+        # Local variables can't share a name with a type,
+        # so look for those first.
+
+        name = self.fn.symtab.get(node.name, None) if self.fn else None
+
+        if name is not None:
+
+            # Locals are always stack slots, so just load them
+
+            load = self.builder.load(name)
+            load.akinode = name.akinode
+            load.akitype = name.akitype
+            return load
+
         # Types are returned, for now, as their enum
 
         named_type = self._get_type_by_name(node.name)
@@ -1627,6 +1920,14 @@ class AkiCodeGen:
         if isinstance(name, ir.Function):
             return name
 
+        # Scalar constants are returned directly as their value
+        const_value = getattr(name, "const_value", None)
+        if const_value is not None:
+            const = ir.Constant(const_value.type, const_value.constant)
+            const.akinode = name.akinode
+            const.akitype = name.akitype
+            return const
+
         # Return object types as a pointer
         if self._is_type(node, name, AkiObject):
             # if this is a global constant
@@ -1682,9 +1983,17 @@ class AkiCodeGen:
         Generates a *compile-time* string constant.
         """
 
+        akitype = self._get_vartype(node.vartype)
+
+        # Identical literals share one set of globals
+
+        pool_key = (node.val, akitype.type_id)
+        data_object = self._string_pool.get(pool_key, None)
+        if data_object is not None:
+            return data_object
+
         const_counter = self._const_counter()
 
-        akitype = self._get_vartype(node.vartype)
         data, data_array = self.types["str"].data(node.val)
 
         # TODO: I'm considering moving this into .data
@@ -1699,21 +2008,26 @@ class AkiCodeGen:
 
         string.global_constant = True
         string.unnamed_addr = True
+        string.linkage = "private"
 
         data_object = ir.GlobalVariable(
             self.module, self.types["str"].llvm_type_base, f".str.{const_counter}"
         )
+        data_object.linkage = "private"
 
         data_object.initializer = ir.Constant(
             self.types["str"].llvm_type_base,
             (
-                (self.types["str"].enum_id, len(data_array), 0, 0),
-                string.bitcast(self.typemgr.as_ptr(self.types["u_mem"]).llvm_type),
+                (self.types["str"].enum_id, len(data), 0, 0),
+                # Pointer to the first byte of the string data
+                string.gep(_gep_index(0, 0)),
             ),
         )
 
         data_object.akitype = akitype
         data_object.akinode = node
+        data_object.c_length = len(data)
+        self._string_pool[pool_key] = data_object
         return data_object
 
     def _builtin_str_init(self, node):
@@ -1800,67 +2114,83 @@ class AkiCodeGen:
         c1 = self._codegen(node_ref)
         c2 = self._get_vartype(target_type)
 
-        target_data = self.typemgr.target_data()
-        c1_size = c1.type.get_abi_size(target_data)
-        c2_size = c2.llvm_type.get_abi_size(target_data)
-
-        try:
-
-            # object casts are not OK
+        # object casts are not OK
 
-            if isinstance(c1.akitype, AkiObject):
-                raise AkiTypeErr(
-                    node_ref,
-                    self.text,
-                    f"Objects are not a valid source for {CMD}cast{REP}",
-                )
+        if isinstance(c1.akitype, AkiObject):
+            raise AkiTypeErr(
+                node_ref,
+                self.text,
+                f"Objects are not a valid source for {CMD}cast{REP}",
+            )
 
-            if isinstance(c2, AkiObject):
-                raise AkiTypeErr(
-                    target_type,
-                    self.text,
-                    f"Objects are not a valid target for {CMD}cast{REP}",
-                )
+        if isinstance(c2, AkiObject):
+            raise AkiTypeErr(
+                target_type,
+                self.text,
+                f"Objects are not a valid target for {CMD}cast{REP}",
+            )
 
-            # same size, so pointer cast is OK
+        c1_size = self.typemgr.abi_size(c1.type)
+        c2_size = self.typemgr.abi_size(c2.llvm_type)
+        size_change = (c2_size > c1_size) - (c2_size < c1_size)
 
-            if c1_size == c2_size:
-                if isinstance(c1.akitype, AkiBaseInt) and isinstance(c2, AkiPointer):
-                    c3 = self.builder.inttoptr(c1, c2.llvm_type)
-                    raise LocalException
-                elif isinstance(c1.akitype, AkiPointer) and isinstance(c2, AkiBaseInt):
-                    c3 = self.builder.ptrtoint(c1, c2.llvm_type)
-                    raise LocalException
-                else:
-                    c3 = self.builder.bitcast(c1, c2.llvm_type)
-                    raise LocalException
+        c1_kind = self._cast_kind(c1.akitype)
+        c2_kind = self._cast_kind(c2)
 
+        if size_change:
             # different size, pointer cast not OK
-
-            if isinstance(c1.akitype, AkiPointer) or isinstance(c2, AkiPointer):
+            if c1_kind == "ptr" or c2_kind == "ptr":
                 raise AkiTypeErr(
                     node_ref,
                     self.text,
                     f"Types must be of same size for pointer {CMD}cast{REP}",
                 )
+            # zero-extend or truncate as needed
+            op = self._cast_resize_ops[size_change]
+        else:
+            # same size, so pointer cast is OK
+            op = self._cast_same_size_ops.get((c1_kind, c2_kind), "bitcast")
 
-            # different size, zero-extend or truncate as needed
+        # Integer constants are folded rather than cast at runtime
 
-            if c2_size > c1_size:
-                c3 = self.builder.zext(c1, c2.llvm_type)
-                raise LocalException
-            elif c2_size < c1_size:
-                c3 = self.builder.trunc(c1, c2.llvm_type)
-                raise LocalException
-
-        except LocalException:
-            pass
+        if (
+            c1_kind == "int"
+            and c2_kind == "int"
+            and isinstance(c1, ir.Constant)
+            and isinstance(c1.constant, int)
+        ):
+            c3 = ir.Constant(c2.llvm_type, self._cast_int_value(c1, c2, op))
+        else:
+            c3 = getattr(self.builder, op)(c1, c2.llvm_type)
 
         c3.akitype = c2
         c3.akinode = node
         c3.akinode.vartype = c2
         return c3
 
+    def _cast_int_value(self, c1, c2, op):
+        """
+        Compute the result of an integer cast of a constant.
+        """
+        bits = c1.type.width if op == "zext" else c2.llvm_type.width
+        value = c1.constant & ((1 << bits) - 1)
+        if c2.signed and value >> (c2.llvm_type.width - 1):
+            value -= 1 << c2.llvm_type.width
+        return value
+
+    def _cast_kind(self, akitype):
+        """
+        Classify a type for selecting a cast instruction.
+        """
+        if isinstance(akitype, AkiPointer):
+            return "ptr"
+        if isinstance(akitype, AkiBaseInt):
+            return "int"
+        return None
+
+    _cast_same_size_ops = {("int", "ptr"): "inttoptr", ("ptr", "int"): "ptrtoint"}
+    _cast_resize_ops = {1: "zext", -1: "trunc"}
+
     def _builtins_size(self, node):
         """
         Get the size, in bytes, of the variable allocation in question.        
@@ -1871,7 +2201,7 @@ class AkiCodeGen:
         self._argcheck(node, 1)
         node_ref = node.arguments[0]
         item = self._codegen(node_ref)
-        byte_width = item.type.get_abi_size(self.typemgr.target_data())
+        byte_width = self.typemgr.abi_size(item.type)
         return self._codegen(Constant(node, byte_width, self.typemgr._default))
 
     def _builtins_c_size(self, node):
@@ -1905,7 +2235,7 @@ class AkiCodeGen:
         if isinstance(node_ref, Name):
             ref = self._name(node, node_ref.name)
         elif isinstance(node_ref, AccessorExpr):
-            ref = self._codegen_AccessorExpr(node_ref, False)
+            ref = self._accessor_ref(node_ref)
             node_ref.vartype = ref.akitype.type_id
             # XXX: This creates a pointer to an ARRAY and not
             # an ARRAY OBJECT.
@@ -1938,7 +2268,7 @@ class AkiCodeGen:
         # modify its Aki properties independently. Otherwise the original
         # Aki variable reference has its properties clobbered.
 
-        r1 = self.builder.gep(ref, [_int(0)])
+        r1 = self.builder.gep(ref, _gep_index(0))
         r1.akinode = node_ref
         r1.akitype = self.typemgr.as_ptr(ref.akitype, literal_ptr=True)
         r1.akitype.llvm_type.pointee.akitype = ref.akitype
@@ -1976,6 +2306,17 @@ class AkiCodeGen:
         f1.akitype = ref.akitype.llvm_type.pointee.akitype
         return f1
 
+    _builtins = {
+        "dummy": _builtins_dummy,
+        "type": _builtins_type,
+        "cast": _builtins_cast,
+        "size": _builtins_size,
+        "c_size": _builtins_c_size,
+        "c_data": _builtins_c_data,
+        "ref": _builtins_ref,
+        "deref": _builtins_deref,
+    }
+
     #################################################################
     # Decorators
     #################################################################
@@ -1991,3 +2332,9 @@ class AkiCodeGen:
 
     def _decorator_noinline_exit(self):
         return self._decorator_inline_exit()
+
+    # Enter and exit handlers for each decorator
+    _decorators = {
+        "inline": (_decorator_inline_enter, _decorator_inline_exit),
+        "noinline": (_decorator_noinline_enter, _decorator_noinline_exit),
+    }
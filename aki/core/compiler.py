@@ -1,6 +1,7 @@
 import llvmlite.binding as llvm
 from llvmlite import ir
 import datetime
+import hashlib
 
 llvm.initialize()
 llvm.initialize_native_target()
@@ -10,7 +11,9 @@ import os
 
 
 class AkiCompiler:
-    def __init__(self):
+    def __init__(
+        self, opt_level=2, cache_dir=None, inlining_threshold=225, report=None
+    ):
         """
         Create execution engine.
         """
@@ -19,13 +22,63 @@ class AkiCompiler:
         self.target = llvm.Target.from_default_triple()
         self.target_machine = self.target.create_target_machine()
 
+        # Build the optimization pipeline once and reuse it for every module
+        self.opt_level = opt_level
+        self.pass_manager = None
+        if opt_level:
+            pm_builder = llvm.create_pass_manager_builder()
+            pm_builder.opt_level = opt_level
+            # Cost-based threshold for LLVM's inliner. Small functions
+            # are already marked alwaysinline during codegen
+            # (see AkiCodeGen.inline_threshold), so this only decides
+            # the calls left over after that.
+            pm_builder.inlining_threshold = inlining_threshold
+            self.pass_manager = llvm.create_module_pass_manager()
+            self.target_machine.add_analysis_passes(self.pass_manager)
+            pm_builder.populate(self.pass_manager)
+
         # Prepare the engine with an empty module
         self.backing_mod = llvm.parse_assembly("")
         self.engine = llvm.create_mcjit_compiler(self.backing_mod, self.target_machine)
         self.mod_ref = None
 
-        # Not used yet
-        # self.engine.set_object_cache(export,None)
+        # Reuse object code for modules whose final IR hasn't changed
+        self.cache_dir = cache_dir
+        self.report = report
+        if cache_dir is not None:
+            self.engine.set_object_cache(self.store_object, self.load_object)
+
+    def object_path(self, mod):
+        """
+        Path to the cached object code for a module, keyed on its IR.
+        """
+        key = hashlib.blake2b(
+            f"{self.target_machine.triple}\n{mod}".encode("utf8"), digest_size=16
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.akio")
+
+    def store_object(self, mod, buffer):
+        """
+        Save object code emitted for a module.
+        """
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(self.object_path(mod), "wb") as file:
+                file.write(buffer)
+        except OSError as e:
+            if self.report is not None:
+                self.report(f"Can't write object cache file: {e}")
+
+    def load_object(self, mod):
+        """
+        Return previously emitted object code for a module, if any.
+        """
+        try:
+            with open(self.object_path(mod), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
 
     def compile_ir(self, llvm_ir):
         """
@@ -34,15 +87,26 @@ class AkiCompiler:
         mod = llvm.parse_assembly(llvm_ir)
         return self.finalize_compilation(mod)
 
-    def compile_bc(self, bc):
+    def compile_bc(self, bc, optimize=True):
         """
         Compile a module from LLVM bitcode.
+        Pass `optimize=False` for bitcode that has already been optimized.
         """
         mod = llvm.parse_bitcode(bc)
-        return self.finalize_compilation(mod)
+        return self.finalize_compilation(mod, optimize)
+
+    def optimize(self, mod):
+        """
+        Run the module through the optimization pipeline, if any.
+        """
+        if self.pass_manager is not None:
+            self.pass_manager.run(mod)
+        return mod
 
-    def finalize_compilation(self, mod):
+    def finalize_compilation(self, mod, optimize=True):
         mod.verify()
+        if optimize:
+            self.optimize(mod)
         self.engine.add_module(mod)
         self.engine.finalize_object()
         self.engine.run_static_constructors()
@@ -73,6 +137,8 @@ class AkiCompiler:
             with open(os.path.join("output", f"{filename}.akib"), "wb") as file:
                 file.write(mod.as_bitcode())
 
+        return mod
+
     def get_addr(self, func_name="main"):
         # Obtain module entry point
         func_ptr = self.engine.get_function_address(func_name)
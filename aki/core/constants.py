@@ -33,6 +33,15 @@ def defaults():
             "compile_on_load": ("Compile immediately when a file is loaded.", True),
             "cache_compilation": ("Cache compiled files for reuse", True),
             "ignore_cache": ("Ignore cached files when recompiling", False),
+            "opt_level": ("LLVM optimization level for compiled modules (0-3)", 2),
+            "inlining_threshold": (
+                "Cost threshold for LLVM's inliner (225 is LLVM's own -O2 default). Applies to calls not already marked alwaysinline by Aki's instruction-count check.",
+                225,
+            ),
+            "cache_objects": (
+                'Cache compiled object code in "{settings.paths.output_dir}/__akic__". Not evicted automatically.',
+                False,
+            ),
         },
     }
 
@@ -72,6 +72,12 @@ from core import constants
 
 PROMPT = "A>"
 
+# Pickled stdlib AST, by stdlib path, shared across REPL resets.
+_stdlib_cache: dict = {}
+
+# Compiled stdlib bitcode, by stdlib path.
+_stdlib_bitcode: dict = {}
+
 USAGE = f"""From the {PROMPT} prompt, type Aki code or enter special commands
 preceded by a dot sign:
 
@@ -135,42 +141,59 @@ pyaki  :{constants.VERSION}"""
         mod.codegen = AkiCodeGen(mod, typemgr, name, other_modules)
         return mod
 
+    stdlib_layers = ("layer_0.aki", "layer_1.aki")
+
     def compile_stdlib(self):
         stdlib_path = os.path.join(self.paths["stdlib"], "nt")
         stdlib = []
 
-        for _ in ("0", "1"):
-            with open(os.path.join(stdlib_path, f"layer_{_}.aki")) as f:
+        for _ in self.stdlib_layers:
+            with open(os.path.join(stdlib_path, _)) as f:
                 stdlib.append(f.read())
 
         text = "\n".join(stdlib)
         ast = AkiParser.parse(text)
 
         self.dump_ast(os.path.join(stdlib_path, "stdlib.akic"), ast, text)
+        _stdlib_cache.pop(stdlib_path, None)
+        _stdlib_bitcode.pop(stdlib_path, None)
 
         return ast, text
 
     def load_stdlib(self):
         stdlib_path = os.path.join(self.paths["stdlib"], "nt")
 
-        if not os.path.exists(os.path.join(stdlib_path, "stdlib.akic")):
-            cp("Compiling stdlib")
-            ast, text = self.compile_stdlib()
+        cached_ast = _stdlib_cache.get(stdlib_path)
+        if cached_ast is not None:
+            ast = pickle.loads(cached_ast)
         else:
-            with open(os.path.join(stdlib_path, "stdlib.akic"), "rb") as file:
-                mod_in = pickle.load(file)
-            ast, text = mod_in["ast"], mod_in["text"]
+            cache_file = os.path.join(stdlib_path, "stdlib.akic")
+            if not os.path.exists(cache_file) or any(
+                os.path.getmtime(os.path.join(stdlib_path, _))
+                > os.path.getmtime(cache_file)
+                for _ in self.stdlib_layers
+            ):
+                cp("Compiling stdlib")
+                ast, text = self.compile_stdlib()
+            else:
+                with open(cache_file, "rb") as file:
+                    mod_in = pickle.load(file)
+                ast, text = mod_in["ast"], mod_in["text"]
+            _stdlib_cache[stdlib_path] = pickle.dumps(ast)
 
         self.stdlib_module = self.make_module("stdlib")
 
         codegen = AkiCodeGen(self.stdlib_module, module_name="stdlib").eval(ast)
-        self.stdlib_module_ref = self.compiler.compile_module(
-            self.stdlib_module, "stdlib"
-        )
+        bitcode = _stdlib_bitcode.get(stdlib_path)
+        if bitcode is None:
+            self.stdlib_module_ref = self.compiler.compile_module(
+                self.stdlib_module, "stdlib"
+            )
+            _stdlib_bitcode[stdlib_path] = self.stdlib_module_ref.as_bitcode()
+        else:
+            self.stdlib_module_ref = self.compiler.compile_bc(bitcode, optimize=False)
 
-    def run(self, initial_load=False):
-        if initial_load:
-            self.compile_stdlib()
+    def run(self):
         import shutil
 
         cols = shutil.get_terminal_size()[0]
@@ -445,23 +468,27 @@ pyaki  :{constants.VERSION}"""
         proto = Prototype(_.index, call_name, (), None)
         func = Function(_.index, proto, ExpressionBlock(_.index, ast_stack))
 
+        repl_codegen = self.repl_module.codegen
+        repl_globals = self.repl_module.globals
+
         if not immediate_mode:
             for k, v in self.main_module.codegen.module.globals.items():
                 if isinstance(v, ir.GlobalVariable):
-                    self.repl_module.codegen.module.globals[k] = v
+                    repl_globals[k] = v
                 else:
                     f_ = External(None, v.akinode, None)
-                    self.repl_module.codegen.eval([f_])
+                    repl_codegen.eval([f_])
 
         try:
-            self.repl_module.codegen.eval([func])
+            repl_codegen.eval([func])
         except AkiBaseErr as e:
             # if not immediate_mode:
             # self.repl_cpl.codegen.other_modules.pop()
-            del self.repl_module.globals[call_name]
+            repl_globals.pop(call_name, None)
             raise e
 
-        first_result_type = self.repl_module.globals[call_name].return_value.akitype
+        call_func = repl_globals[call_name]
+        first_result_type = call_func.return_value.akitype
 
         # If the result from the codegen is an object,
         # redo the codegen with an addition to the AST stack
@@ -487,12 +514,13 @@ pyaki  :{constants.VERSION}"""
             # but I'm keeping this anyway
 
             try:
-                self.repl_module.codegen.eval([func])
+                repl_codegen.eval([func])
             except AkiBaseErr as e:
-                del self.repl_module.module.globals[call_name]
+                repl_globals.pop(call_name, None)
                 raise e
 
-            final_result_type = self.repl_module.globals[call_name].return_value.akitype
+            call_func = repl_globals[call_name]
+            final_result_type = call_func.return_value.akitype
 
         else:
             final_result_type = first_result_type
@@ -507,7 +535,7 @@ pyaki  :{constants.VERSION}"""
 
         # Get the function signature
         func_signature = [
-            _.aki.vartype.aki_type.c() for _ in self.repl_module.globals[call_name].args
+            _.aki.vartype.aki_type.c() for _ in call_func.args
         ]
 
         # Generate a result
@@ -560,7 +588,15 @@ pyaki  :{constants.VERSION}"""
             self.typemgr = AkiTypeMgr()
         self.types = self.typemgr.types
 
-        self.compiler = AkiCompiler()
+        cache_dir = None
+        if self.settings["cache_objects"] and not self.settings["ignore_cache"]:
+            cache_dir = os.path.join(self.paths["output_dir"], "__akic__")
+        self.compiler = AkiCompiler(
+            opt_level=self.settings["opt_level"],
+            cache_dir=cache_dir,
+            inlining_threshold=self.settings["inlining_threshold"],
+            report=cp,
+        )
         self.load_stdlib()
         self.main_module = self.make_module(None)
         self.repl_module = self.make_module(".repl")
@@ -1,6 +1,7 @@
 # Test all code generation functions.
 
 import unittest
+from collections import deque
 from core.error import AkiTypeErr, AkiSyntaxErr, AkiBaseErr, AkiOpError
 
 
@@ -19,7 +20,7 @@ class TestLexer(unittest.TestCase):
 
     def ex(self, err_type, test):
         with self.assertRaises(err_type):
-            [_ for _ in self.i(test, True)]
+            deque(self.i(test, True), maxlen=0)
 
     def test_constants(self):
         self.e(r"2", 2)
@@ -108,6 +109,7 @@ class TestLexer(unittest.TestCase):
         self.e(r"if 0 2 else 3", 3)
         self.e(r"when 1 2 else 3", 1)
         self.e(r"when 0 2 else 3", 0)
+        self.e(r"var x = when 1==1 2 else 3 x", True)
         self.e(r"var x=1, y=2 if x==2 or y==1 3 else 4", 4)
         self.e(r"var x=1, y=2 if x==1 or y==2 3 else 4", 3)
         self.e(r"var x=1, y=2 if x==1 and y==2 3 else 4", 3)
@@ -244,6 +246,7 @@ class TestLexer(unittest.TestCase):
         # truncation
         self.e(r"unsafe cast(0x000000ff,u8)", 255)
         self.e(r"type(unsafe cast(0x000000ff,u8))=={var x:u8 type(x)}", True)
+        self.e(r"unsafe cast(0x0000012c,u8)", 44)
         # zero extend
         self.e(r"unsafe cast(0xff,u64)", 255)
         self.e(r"type(unsafe cast(0xff,u64))=={var x:u64 type(x)}", True)
@@ -287,6 +290,7 @@ class TestLexer(unittest.TestCase):
     def test_array_trapping(self):
         self.ex(AkiTypeErr, r"var x:array i32[20]=0")
         self.ex(AkiTypeErr, r"var x:array i32[20]=0")
+        self.ex(AkiTypeErr, r"var x:array i32[2,2] x[0,0,0]")
 
     def test_pointer_comparison(self):
         self.e(r"def a1(x:ptr i32){x} var x=32 var y=ref(x) var z=a1(y) z==y", True)
@@ -297,6 +301,7 @@ class TestLexer(unittest.TestCase):
 
     def test_c_size(self):
         self.e(r"c_size('Hello there')", 12)
+        self.e(r"var x='Hello there' c_size(x)", 12)
         self.e(r"c_size(1)", 4)
         self.e(r"c_size(1:u64)", 8)
 